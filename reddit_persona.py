@@ -1,30 +1,110 @@
-import praw
-import re
-from typing import List, Dict
-import spacy
-from transformers import pipeline
+import hashlib
+import heapq
 import json
+import logging
 import os
+import re
+import shelve
+import shutil
+import string
+import tempfile
+import threading
+from bisect import bisect_right
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
 from getpass import getpass
-import logging
+from pathlib import Path
+from typing import List, Dict, Iterator, Optional, Set, Tuple
+
+import ahocorasick
+import onnxruntime
+import praw
+import spacy
+import torch
+from optimum.onnxruntime import ORTModelForSeq2SeqLM, ORTQuantizer
+from optimum.onnxruntime.configuration import AutoQuantizationConfig
+from spacy.tokens import Doc, DocBin
+from transformers import AutoTokenizer
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
-# Initialize spaCy for NER
+# Initialize spaCy for NER; only entities are used, so skip the other components
 try:
-    nlp = spacy.load("en_core_web_sm")
+    nlp = spacy.load("en_core_web_sm", disable=["parser", "tagger", "attribute_ruler", "lemmatizer"])
 except Exception as e:
     logger.error(f"Error loading spaCy model: {e}")
     raise
 
-# Initialize T5 for summarization (lightweight to avoid MPS error)
+# Summarization model, exported to ONNX and quantized to int8 for CPU inference
+SUMMARIZER_MODEL = "sshleifer/distilbart-cnn-6-6"
+SUMMARY_PREFIX = ""  # T5 checkpoints need "summarize: "; BART does not
+MIN_SUMMARY_TOKENS = 40  # Shorter inputs use the template summary instead
+MIN_SUMMARY_CHARS = 60  # Cheap pre-check before tokenizing: low-signal noise is never summarized
+MIN_SUMMARY_SPACES = 8
+ONNX_CACHE_DIR = os.path.join(".onnx_cache", f"{SUMMARIZER_MODEL.replace('/', '--')}-int8")
+ONNX_FILES = ["encoder_model.onnx", "decoder_model.onnx", "decoder_with_past_model.onnx"]
+QUANTIZED_FILES = [f.replace(".onnx", "_quantized.onnx") for f in ONNX_FILES]
+
+# Small batches of short sequences lose time to thread launch overhead on many cores
+INFERENCE_THREADS = min(4, os.cpu_count() or 1)
+torch.set_num_threads(INFERENCE_THREADS)
+torch.set_num_interop_threads(1)
+
+def load_quantized_summarizer(cache_dir: str = ONNX_CACHE_DIR) -> ORTModelForSeq2SeqLM:
+    """
+    Load the int8 ONNX summarizer, exporting and quantizing it on first use.
+    
+    Args:
+        cache_dir: Directory holding the quantized model between runs.
+    Returns:
+        Quantized ONNX Runtime seq2seq model.
+    """
+    required = QUANTIZED_FILES + ["config.json"]
+    if not all(os.path.exists(os.path.join(cache_dir, f)) for f in required):
+        logger.info(f"Exporting {SUMMARIZER_MODEL} to ONNX and quantizing to int8 (one-time)")
+        parent_dir = os.path.dirname(cache_dir) or "."
+        os.makedirs(parent_dir, exist_ok=True)
+        # Build in temporary directories so an interrupted export never leaves a partial cache,
+        # and the fp32 export is deleted once quantization finishes
+        staging_dir = tempfile.mkdtemp(dir=parent_dir)
+        try:
+            with tempfile.TemporaryDirectory() as export_dir:
+                model = ORTModelForSeq2SeqLM.from_pretrained(SUMMARIZER_MODEL, export=True)
+                model.save_pretrained(export_dir)
+                qconfig = AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+                for file_name in ONNX_FILES:
+                    quantizer = ORTQuantizer.from_pretrained(export_dir, file_name=file_name)
+                    quantizer.quantize(save_dir=staging_dir, quantization_config=qconfig)
+                model.config.save_pretrained(staging_dir)
+            missing = [f for f in required if not os.path.exists(os.path.join(staging_dir, f))]
+            if missing:
+                raise RuntimeError(f"Quantized export is missing {missing}")
+            if os.path.isdir(cache_dir):
+                shutil.rmtree(cache_dir)  # Leftover from an older, incomplete export
+            os.replace(staging_dir, cache_dir)
+        except BaseException:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            raise
+    session_options = onnxruntime.SessionOptions()
+    session_options.intra_op_num_threads = INFERENCE_THREADS
+    session_options.inter_op_num_threads = 1
+    return ORTModelForSeq2SeqLM.from_pretrained(
+        cache_dir,
+        session_options=session_options,
+        encoder_file_name=QUANTIZED_FILES[0],
+        decoder_file_name=QUANTIZED_FILES[1],
+        decoder_with_past_file_name=QUANTIZED_FILES[2]
+    )
+
 try:
-    summarizer = pipeline("summarization", model="t5-small", device=-1)  # CPU
-    logger.info("Summarizer device set to use cpu")
+    tokenizer = AutoTokenizer.from_pretrained(SUMMARIZER_MODEL)
+    summarizer = load_quantized_summarizer()
+    logger.info("Summarizer set to use ONNX Runtime (int8) on cpu")
 except Exception as e:
-    logger.error(f"Error loading T5 model: {e}")
+    logger.error(f"Error loading summarization model: {e}")
     raise
 
 # Initialize Reddit API with PRAW
@@ -42,6 +122,80 @@ except Exception as e:
     logger.error(f"Error initializing PRAW: {e}")
     raise
 
+# Listing sizes and early-exit thresholds: stop fetching once enough signal is collected
+FETCH_LIMIT = 50
+ENOUGH_SUBREDDITS = 10
+ENOUGH_TECH_TEXTS = 30
+
+# Concurrent fetches are capped to stay within Reddit API rate limits
+MAX_FETCH_WORKERS = 4
+_thread_local = threading.local()
+
+def get_reddit() -> praw.Reddit:
+    """
+    Return a Reddit client for the current thread (PRAW instances are not thread-safe).
+    
+    Returns:
+        praw.Reddit instance owned by the calling thread.
+    """
+    if threading.current_thread() is threading.main_thread():
+        return reddit
+    if not hasattr(_thread_local, "reddit"):
+        _thread_local.reddit = praw.Reddit(
+            client_id=client_id,
+            client_secret=client_secret,
+            user_agent=user_agent
+        )
+    return _thread_local.reddit
+
+# On-disk caches reused across runs; Reddit data is refreshed daily
+REDDIT_CACHE_PATH = ".reddit_cache"
+REDDIT_CACHE_VERSION = 2  # Bump when the shape of fetched data changes
+SUMMARY_CACHE_PATH = ".summary_cache"
+SPACY_CACHE_DIR = ".spacy_cache"
+
+# Cheap pre-filter for texts that could contain a named entity
+CAPITALIZED_WORD_RE = re.compile(r"\b[A-Z][a-z]+")
+
+# Subreddit groupings used to classify activity
+GENERAL_SET = frozenset(["askreddit", "pics", "videos", "funny"])
+TECH_SET = frozenset(["programming", "chatgpt", "aivideo", "visionpro", "visionosdev", "datascience"])
+ACADEMIC_SET = frozenset(["studying", "university", "college"])
+CITY_SET = frozenset(["sanfrancisco", "boston", "toronto", "london", "trier"])
+SKILLS_TECH_SET = TECH_SET | {"python", "javascript", "unity"}
+JOB_SET = frozenset(["jobs", "careerguidance"])
+YOUNG_SET = frozenset(["teenagers", "genz", "visionpro", "visionosdev", "civ5", "manorlords"])
+
+# Phrases marking off-topic (non-tech) content, filtered from texts and summaries
+NON_TECH_PHRASES = ["tiktok", "h1b", "adventurous city", "intern season", "new york city is equally", "transient being", "wrong party", "three years", "nightlife", "orgy dome", "social media", "neighborhood"]
+NON_TECH_SUB_RE = re.compile("|".join(map(re.escape, NON_TECH_PHRASES)))
+WHITESPACE_RE = re.compile(r"\s+")
+
+# Text analysis patterns and keyword sets, compiled once
+AGE_RE = re.compile(r"(?:I(?:'m| am)\s+(\d{2})(?:yo| years old)?)", re.IGNORECASE)
+TECH_KW = frozenset(["ar", "vr", "ai", "vision pro", "technology", "tech", "augmented reality", "virtual reality", "chatgpt", "visionosdev", "aivideo"])
+INSIGHT_KW = frozenset(["suggest", "recommend", "solution", "idea"])
+
+def _build_keyword_automaton() -> ahocorasick.Automaton:
+    """
+    Build an Aho-Corasick automaton over the tech, non-tech and insight keywords.
+    
+    Returns:
+        Automaton whose values are (categories, keyword) pairs.
+    """
+    keyword_categories = defaultdict(set)
+    for category, keywords in (("tech", TECH_KW), ("non_tech", NON_TECH_PHRASES), ("insight", INSIGHT_KW)):
+        for kw in keywords:
+            keyword_categories[kw].add(category)
+    automaton = ahocorasick.Automaton()
+    for kw, categories in keyword_categories.items():
+        automaton.add_word(kw, (frozenset(categories), kw))
+    automaton.make_automaton()
+    return automaton
+
+# Matches every keyword category in a single pass over a text
+KEYWORD_AUTOMATON = _build_keyword_automaton()
+
 def get_usernames() -> List[str]:
     """
     Prompt for Reddit usernames and clean input.
@@ -64,29 +218,55 @@ def fetch_reddit_data(username: str) -> Dict:
     Args:
         username: Reddit username.
     Returns:
-        Dictionary with posts, comments, and basic user info.
+        Dictionary with posts, comments, and basic user info, plus parallel
+        lists (lower-cased subreddits, upvotes, texts) for the analysis passes.
     """
     try:
-        redditor = reddit.redditor(username)
+        redditor = get_reddit().redditor(username)
         redditor.id  # Triggers API call to check user
         posts = []
         comments = []
+        post_subreddits_lower = []
+        post_upvotes = []
+        comment_subreddits_lower = []
+        texts = []
+        texts_lower = []
+        subreddits = set()
+        tech_texts = 0
         
-        for submission in redditor.submissions.new(limit=100):
-            posts.append({
+        for submission in redditor.submissions.new(limit=FETCH_LIMIT):
+            post = {
                 "text": submission.title + " " + (submission.selftext or ""),
                 "subreddit": submission.subreddit.display_name,
                 "url": submission.url,
                 "upvotes": submission.score,
                 "num_comments": submission.num_comments
-            })
+            }
+            posts.append(post)
+            post_subreddits_lower.append(post["subreddit"].lower())
+            subreddits.add(post_subreddits_lower[-1])
+            post_upvotes.append(post["upvotes"])
+            texts.append(post["text"])
+            texts_lower.append(post["text"].lower())
+            tech_texts += _is_tech_text(texts_lower[-1])
+            if len(subreddits) >= ENOUGH_SUBREDDITS and tech_texts >= ENOUGH_TECH_TEXTS:
+                break
         
-        for comment in redditor.comments.new(limit=100):
-            comments.append({
-                "text": comment.body,
-                "subreddit": comment.subreddit.display_name,
-                "url": f"https://www.reddit.com{comment.permalink}"
-            })
+        if len(subreddits) < ENOUGH_SUBREDDITS or tech_texts < ENOUGH_TECH_TEXTS:
+            for comment in redditor.comments.new(limit=FETCH_LIMIT):
+                comment_data = {
+                    "text": comment.body,
+                    "subreddit": comment.subreddit.display_name,
+                    "url": f"https://www.reddit.com{comment.permalink}"
+                }
+                comments.append(comment_data)
+                comment_subreddits_lower.append(comment_data["subreddit"].lower())
+                subreddits.add(comment_subreddits_lower[-1])
+                texts.append(comment_data["text"])
+                texts_lower.append(comment_data["text"].lower())
+                tech_texts += _is_tech_text(texts_lower[-1])
+                if len(subreddits) >= ENOUGH_SUBREDDITS and tech_texts >= ENOUGH_TECH_TEXTS:
+                    break
         
         logger.info(f"Fetched data for {username}: {len(posts)} posts, {len(comments)} comments")
         return {
@@ -94,15 +274,135 @@ def fetch_reddit_data(username: str) -> Dict:
             "posts": posts,
             "comments": comments,
             "karma": redditor.comment_karma + redditor.link_karma,
-            "exists": True
+            "exists": True,
+            "post_subreddits_lower": post_subreddits_lower,
+            "post_upvotes": post_upvotes,
+            "comment_subreddits_lower": comment_subreddits_lower,
+            "texts": texts,
+            "texts_lower": texts_lower
         }
     except Exception as e:
         logger.error(f"Error fetching data for {username}: {e}")
-        return {"username": username, "posts": [], "comments": [], "karma": 0, "exists": False}
+        return {
+            "username": username, "posts": [], "comments": [], "karma": 0, "exists": False,
+            "post_subreddits_lower": [], "post_upvotes": [], "comment_subreddits_lower": [],
+            "texts": [], "texts_lower": []
+        }
+
+def summarize_texts(texts: List[str]) -> List[Optional[str]]:
+    """
+    Summarize several texts with the quantized model in batches.
+    
+    Args:
+        texts: Texts to summarize; empty or very short texts are skipped.
+    Returns:
+        Summaries aligned with texts, None where no summary was produced.
+    """
+    summaries = [None] * len(texts)
+    with shelve.open(SUMMARY_CACHE_PATH) as cache:
+        indices = []
+        for i, text in enumerate(texts):
+            if len(text) < MIN_SUMMARY_CHARS or text.count(" ") < MIN_SUMMARY_SPACES:
+                continue
+            key = _summary_cache_key(text)
+            if key in cache:
+                summaries[i] = cache[key]
+            elif len(tokenizer(text)["input_ids"]) >= MIN_SUMMARY_TOKENS:
+                indices.append(i)
+        if not indices:
+            return summaries
+        batch_size = min(8, len(indices))
+        results = []
+        try:
+            for start in range(0, len(indices), batch_size):
+                batch = [SUMMARY_PREFIX + texts[i] for i in indices[start:start + batch_size]]
+                inputs = tokenizer(batch, padding=True, truncation=True, return_tensors="pt")
+                output_ids = summarizer.generate(**inputs, max_length=50, min_length=10, do_sample=False)
+                results.extend(tokenizer.batch_decode(output_ids, skip_special_tokens=True))
+        except Exception as e:
+            logger.error(f"Error summarizing texts: {e}")
+            return summaries
+        for i, summary in zip(indices, results):
+            summary = WHITESPACE_RE.sub(" ", NON_TECH_SUB_RE.sub("", summary)).strip()
+            summaries[i] = summary
+            cache[_summary_cache_key(texts[i])] = summary
+    return summaries
+
+def _summary_cache_key(text: str) -> str:
+    """
+    Build the summary cache key for a text and the current model.
+    
+    Args:
+        text: Text to summarize.
+    Returns:
+        SHA-1 hex digest of the model name and text.
+    """
+    return hashlib.sha1(f"{SUMMARIZER_MODEL}\n{text}".encode("utf-8")).hexdigest()
+
+def _scan_keywords(text_lower: str) -> Tuple[Set[str], List[Tuple[int, str]]]:
+    """
+    Match all tracked keywords in one pass with KEYWORD_AUTOMATON.
+    
+    Args:
+        text_lower: Lower-cased post or comment text.
+    Returns:
+        Keyword categories present in the text, and (start offset, keyword) for each tech match.
+    """
+    categories = set()
+    tech_matches = []
+    for end, (kw_categories, kw) in KEYWORD_AUTOMATON.iter(text_lower):
+        categories.update(kw_categories)
+        if "tech" in kw_categories:
+            tech_matches.append((end - len(kw) + 1, kw))
+    return categories, tech_matches
+
+def _is_tech_text(text_lower: str) -> bool:
+    """
+    Check whether a text mentions at least two tech keywords.
+    
+    Args:
+        text_lower: Lower-cased post or comment text.
+    Returns:
+        True if the text is tech-related.
+    """
+    return len({kw for _, kw in _scan_keywords(text_lower)[1]}) >= 2
+
+def fetch_all_reddit_data(usernames: List[str]) -> Dict[str, Dict]:
+    """
+    Fetch Reddit data for several users concurrently, reusing today's cached results.
+    
+    Args:
+        usernames: List of Reddit usernames.
+    Returns:
+        Dictionary mapping each username to its fetched data.
+    """
+    raw_data = {}
+    today = date.today().isoformat()
+    key_prefix = f"v{REDDIT_CACHE_VERSION}:"
+    key_suffix = f":{today}"
+    with shelve.open(REDDIT_CACHE_PATH) as cache:
+        # Drop entries from earlier days or older cache versions so the shelf stays bounded
+        for stale_key in [k for k in cache.keys() if not (k.startswith(key_prefix) and k.endswith(key_suffix))]:
+            del cache[stale_key]
+        missing = []
+        for username in usernames:
+            key = f"{key_prefix}{username.lower()}{key_suffix}"
+            if key in cache:
+                raw_data[username] = cache[key]
+                logger.info(f"Loaded cached data for {username}")
+            else:
+                missing.append(username)
+        if missing:
+            with ThreadPoolExecutor(max_workers=min(MAX_FETCH_WORKERS, len(missing))) as executor:
+                for username, data in zip(missing, executor.map(fetch_reddit_data, missing)):
+                    raw_data[username] = data
+                    if data["exists"]:
+                        cache[f"{key_prefix}{username.lower()}{key_suffix}"] = data
+    return {username: raw_data[username] for username in usernames}
 
 def generate_enhanced_persona(data: Dict, username: str) -> Dict:
     """
-    Generate enhanced persona from Reddit data using NER and T5.
+    Generate enhanced persona from Reddit data using NER and summarization.
     
     Args:
         data: Dictionary with posts, comments, and user info.
@@ -130,68 +430,89 @@ def generate_enhanced_persona(data: Dict, username: str) -> Dict:
             "personality": "Unknown",
             "sources": []
         }
+    meta = _prepare_persona_inputs(data, username)
+    return _finalize_persona(meta, summarize_texts([meta["combined_text"]])[0])
+
+def _prepare_persona_inputs(data: Dict, username: str) -> Dict:
+    """
+    Compute every persona field except the summary.
     
+    Args:
+        data: Dictionary with posts, comments, and user info.
+        username: Reddit username.
+    Returns:
+        Intermediate persona fields, including the combined_text to summarize.
+    """
     posts = data["posts"]
     comments = data["comments"]
     karma = data["karma"]
     
     # Extract interests and weight by activity, prioritizing tech subreddits
-    subreddit_activity = {}
-    for p in posts:
-        subreddit = p["subreddit"].lower()
-        subreddit_activity[subreddit] = subreddit_activity.get(subreddit, 0) + 1
-    for c in comments:
-        subreddit = c["subreddit"].lower()
-        subreddit_activity[subreddit] = subreddit_activity.get(subreddit, 0) + 1
+    subreddit_activity = Counter(data["post_subreddits_lower"])
+    subreddit_activity.update(data["comment_subreddits_lower"])
     logger.info(f"Subreddit activity for {username}: {subreddit_activity}")
-    general_subreddits = ["askreddit", "pics", "videos", "funny"]
-    tech_subreddits = ["programming", "chatgpt", "aivideo", "visionpro", "visionosdev", "datascience"]
     total_activity = sum(subreddit_activity.values())
-    top_subreddits = sorted(
-        [(s, c) for s, c in subreddit_activity.items() if s in tech_subreddits or (s not in general_subreddits and c >= 0.05 * total_activity)],
-        key=lambda x: (x[0] in tech_subreddits, x[1]),
-        reverse=True
-    )[:5]
+    top_subreddits = heapq.nlargest(
+        5,
+        ((s, c) for s, c in subreddit_activity.items() if s in TECH_SET or (s not in GENERAL_SET and c >= 0.05 * total_activity)),
+        key=lambda x: (x[0] in TECH_SET, x[1])
+    )
     interests = ", ".join(s for s, _ in top_subreddits) if top_subreddits else "General discussions"
+    top_set = {s for s, _ in top_subreddits}
+    has_tech = bool(top_set & TECH_SET)
+    has_academic = bool(top_set & ACADEMIC_SET)
     
-    # Summarize activity with T5, focusing on tech-related views
-    all_texts = [p["text"] for p in posts] + [c["text"] for c in comments]
-    tech_keywords = ["ar", "vr", "ai", "vision pro", "technology", "tech", "augmented reality", "virtual reality", "chatgpt", "visionosdev", "aivideo"]
-    non_tech_phrases = ["tiktok", "h1b", "adventurous city", "intern season", "new york city is equally", "transient being", "wrong party", "three years", "nightlife", "orgy dome", "social media", "neighborhood"]
+    # Single pass over all texts: tech sentences for the summary, engagement
+    # counters, stated age and candidate texts for NER
+    texts = data["texts"]
+    lowered = data["texts_lower"]
     combined_text = []
-    for text in all_texts:
-        if not isinstance(text, str) or not text.strip():
-            continue
-        if any(phrase in text.lower() for phrase in non_tech_phrases):
+    question_count = 0
+    insight_count = 0
+    stated_age = None
+    ner_candidates = []
+    for text, text_lower in zip(texts, lowered):
+        categories, tech_matches = _scan_keywords(text_lower)
+        if "?" in text_lower:
+            question_count += 1
+        if "insight" in categories:
+            insight_count += 1
+        if stated_age is None:
+            match = AGE_RE.search(text)
+            if match and 15 <= int(match.group(1)) <= 80:
+                stated_age = match.group(1)
+        # Entities are capitalized, so texts without a capitalized word can't yield one
+        if CAPITALIZED_WORD_RE.search(text):
+            ner_candidates.append(text)
+        if not text.strip() or "non_tech" in categories or len(tech_matches) < 2:
             continue
+        # Bucket tech matches into sentences by offset; lowercasing preserves
+        # ". " boundaries, so sentence indices line up with text.split(". ")
+        sentence_starts = []
+        offset = 0
+        for sentence_lower in text_lower.split(". "):
+            sentence_starts.append(offset)
+            offset += len(sentence_lower) + 2
+        sentence_keywords = defaultdict(set)
+        for start, kw in tech_matches:
+            sentence_keywords[bisect_right(sentence_starts, start) - 1].add(kw)
         sentences = text.split(". ")
-        tech_sentences = [s for s in sentences if sum(kw in s.lower() for kw in tech_keywords) >= 2]
-        combined_text.extend(tech_sentences)
+        combined_text.extend(sentences[i] for i in sorted(sentence_keywords) if len(sentence_keywords[i]) >= 2)
     combined_text = " ".join(combined_text)[:200]  # Reduced to 200 chars
     logger.info(f"Combined text for {username}: {combined_text}")
-    summary = f"{username.capitalize()} is interested in AR/VR and AI technologies, engaging in related discussions."
-    if combined_text:
-        try:
-            summary = summarizer(combined_text, max_length=50, min_length=10, do_sample=False)[0]["summary_text"]
-            for phrase in non_tech_phrases:
-                summary = summary.replace(phrase, "").replace("  ", " ").strip()
-        except Exception as e:
-            logger.error(f"Error summarizing text for {username}: {e}")
     
     # Analyze engagement style
-    question_count = sum(1 for t in all_texts if isinstance(t, str) and "?" in t)
-    insight_count = sum(1 for t in all_texts if isinstance(t, str) and any(kw in t.lower() for kw in ["suggest", "recommend", "solution", "idea"]))
-    engagement_style = "frequently shares insights" if insight_count > len(all_texts) * 0.3 else "often asks questions" if question_count > len(all_texts) * 0.3 else "actively discusses topics"
+    engagement_style = "frequently shares insights" if insight_count > len(texts) * 0.3 else "often asks questions" if question_count > len(texts) * 0.3 else "actively discusses topics"
     
     # Default fields (no LLM)
     default_fields = {
-        "motivations": "Seeks to connect and share knowledge in tech communities." if any(s in tech_subreddits for s, _ in top_subreddits) else "Seeks to connect and share knowledge in online communities.",
-        "goals": "Develop expertise in AR/VR and AI technologies." if any(s in tech_subreddits for s, _ in top_subreddits) else "Contribute meaningfully to discussions and stay updated on interests.",
+        "motivations": "Seeks to connect and share knowledge in tech communities." if has_tech else "Seeks to connect and share knowledge in online communities.",
+        "goals": "Develop expertise in AR/VR and AI technologies." if has_tech else "Contribute meaningfully to discussions and stay updated on interests.",
         "behaviors": f"Participates in {len(subreddit_activity)} subreddits with {karma} total karma.",
         "habits": f"Regularly posts and comments on Reddit, focusing on {top_subreddits[0][0] if top_subreddits else 'various topics'}.",
-        "frustrations": "Keeping up with rapid tech advancements and managing multiple discussions." if any(s in tech_subreddits for s, _ in top_subreddits) else "Navigating diverse online communities and managing information overload.",
+        "frustrations": "Keeping up with rapid tech advancements and managing multiple discussions." if has_tech else "Navigating diverse online communities and managing information overload.",
         "skills": "Unknown",
-        "personality": "Curious, tech-savvy, and collaborative." if any(s in tech_subreddits for s, _ in top_subreddits) else "Engaged, curious, and community-oriented."
+        "personality": "Curious, tech-savvy, and collaborative." if has_tech else "Engaged, curious, and community-oriented."
     }
     
     # Update fields for AR/VR focus
@@ -200,9 +521,9 @@ def generate_enhanced_persona(data: Dict, username: str) -> Dict:
         default_fields["goals"] = "Build expertise in AR/VR development for innovative applications."
         default_fields["frustrations"] = "Keeping pace with fast-evolving AR/VR tech and community discussions."
         default_fields["personality"] = "Curious, innovative, and tech-enthusiastic."
-    if any(s.lower() in tech_subreddits + ["python", "javascript", "unity"] for s, _ in top_subreddits):
+    if top_set & SKILLS_TECH_SET:
         default_fields["skills"] = "Python, JavaScript, Unity"
-    elif any(s.lower() in ["studying", "university", "college"] for s, _ in top_subreddits):
+    elif has_academic:
         default_fields["skills"] = "Python, R, SQL, data analysis"
     
     # NER for name and place
@@ -229,9 +550,8 @@ def generate_enhanced_persona(data: Dict, username: str) -> Dict:
             logger.info(f"Matched {subreddit} for city: {city}")
             break
     if city == "Unknown":
-        city_subreddits = ["sanfrancisco", "boston", "toronto", "london", "trier"]
-        for subreddit, count in sorted(subreddit_activity.items(), key=lambda x: x[1], reverse=True):
-            if subreddit.lower() in city_subreddits and count >= 0.5 * total_activity:
+        for subreddit, count in subreddit_activity.most_common():
+            if subreddit.lower() in CITY_SET and count >= 0.5 * total_activity:
                 city = location_map[subreddit.lower()]
                 logger.info(f"Matched {subreddit} for city: {city}")
                 break
@@ -242,71 +562,144 @@ def generate_enhanced_persona(data: Dict, username: str) -> Dict:
                 logger.info(f"Matched {subreddit} for city: {city}")
                 break
     
-    if city == "Unknown":
-        for text in all_texts:
-            if not isinstance(text, str):
-                continue
-            doc = nlp(text)
+    # NER is only needed while a city is unresolved; stop as soon as nothing is left to find
+    need_name = True  # No earlier step resolves the name, so NER always looks for one
+    need_city = city == "Unknown"
+    if need_city:
+        for doc in _iter_ner_docs(ner_candidates, username):
             for ent in doc.ents:
-                if ent.label_ == "PERSON" and ent.text.lower() not in blocklist and any(n in ent.text.lower() for n in common_names) and not any(ent.text.lower() in loc.lower() for loc in location_map.values()):
+                if need_name and ent.label_ == "PERSON" and ent.text.lower() not in blocklist and any(n in ent.text.lower() for n in common_names) and not any(ent.text.lower() in loc.lower() for loc in location_map.values()):
                     name = ent.text
+                    need_name = False
                     break
-                if ent.label_ == "GPE" and any(ent.text.lower() in loc.lower() for loc in location_map.values()):
+                if need_city and ent.label_ == "GPE" and any(ent.text.lower() in loc.lower() for loc in location_map.values()):
                     city = next(loc for loc in location_map.values() if ent.text.lower() in loc.lower())
+                    need_city = False
                     break
-            if name != f"{username.capitalize()} User" and city != "Unknown":
+            if not need_name and not need_city:
                 break
     
     # Age inference
     age = "20–30 (estimated)"
-    if any(s.lower() in ["teenagers", "genz", "visionpro", "visionosdev", "civ5", "manorlords"] for s, _ in top_subreddits) and karma < 5000:
+    if top_set & YOUNG_SET and karma < 5000:
         age = "18–24 (estimated)"
-    elif any(s.lower() in ["studying", "university", "college"] for s, _ in top_subreddits):
+    elif has_academic:
         age = "22–26 (estimated)"
-    elif any(s.lower() in ["careerguidance", "jobs"] for s, _ in top_subreddits):
+    elif top_set & JOB_SET:
         age = "25–35 (estimated)"
-    age_pattern = r"(?:I(?:'m| am)\s+(\d{2})(?:yo| years old)?)"
-    for text in all_texts:
-        if not isinstance(text, str):
-            continue
-        match = re.search(age_pattern, text, re.IGNORECASE)
-        if match and 15 <= int(match.group(1)) <= 80:
-            age = f"{match.group(1)} (inferred)"
-            break
+    if stated_age is not None:
+        age = f"{stated_age} (inferred)"
     
     # Occupation inference
     occupation = "Reddit Enthusiast"
-    academic_subreddits = ["studying", "university", "college"]
-    tech_upvotes = sum(p["upvotes"] for p in posts if p["subreddit"].lower() in tech_subreddits)
-    tech_activity = sum(subreddit_activity.get(s, 0) for s in tech_subreddits)
-    if any(s.lower() in tech_subreddits for s, _ in top_subreddits) and tech_upvotes > 150 and tech_activity > 20:
+    tech_upvotes = sum(u for u, s in zip(data["post_upvotes"], data["post_subreddits_lower"]) if s in TECH_SET)
+    tech_activity = sum(subreddit_activity.get(s, 0) for s in TECH_SET)
+    if has_tech and tech_upvotes > 150 and tech_activity > 20:
         occupation = "Tech Professional"
-    elif any(s.lower() in tech_subreddits for s, _ in top_subreddits):
+    elif has_tech:
         occupation = "Computer Science Student"
-    elif any(s.lower() in academic_subreddits for s, _ in top_subreddits):
+    elif has_academic:
         occupation = "Graduate Student"
-    elif any(s.lower() in ["jobs", "careerguidance"] for s, _ in top_subreddits):
+    elif top_set & JOB_SET:
         occupation = "Job Seeker"
     
-    # Generate detailed about field
-    primary_interest = top_subreddits[0][0] if top_subreddits else "various topics"
-    about = (f"{name} is a {occupation.lower()} who actively engages in {len(subreddit_activity)} Reddit communities, "
-             f"with a strong focus on {primary_interest}. They {engagement_style}, often sharing their passion for "
-             f"{'AR/VR and AI technologies' if any(s in tech_subreddits for s, _ in top_subreddits) else 'diverse topics'}. "
-             f"{summary} Their posts and comments reveal a curious mind, eager to explore "
-             f"{'emerging tech trends' if any(s in tech_subreddits for s, _ in top_subreddits) else 'varied interests'} and connect "
-             f"with others in {'tech' if any(s in tech_subreddits for s, _ in top_subreddits) else 'online'} communities.")
-    
     # Collect sources for citations
     sources = list(set([p["url"] for p in posts[:2]] + [c["url"] for c in comments[:2]]))
     
     return {
+        "username": username,
+        "combined_text": combined_text,
         "name": name,
         "age": age,
         "occupation": occupation,
         "place": city,
-        "status": "Unknown",
         "interests": interests,
+        "primary_interest": top_subreddits[0][0] if top_subreddits else "various topics",
+        "community_count": len(subreddit_activity),
+        "engagement_style": engagement_style,
+        "is_tech": has_tech,
+        "default_fields": default_fields,
+        "sources": sources
+    }
+
+def _iter_ner_docs(texts: List[str], username: str) -> Iterator[Doc]:
+    """
+    Yield NER docs for texts, reusing the user's cached DocBin and parsing only new texts.
+    
+    Args:
+        texts: Texts to run NER on.
+        username: Reddit username owning the DocBin cache file.
+    Yields:
+        spaCy Doc for each text, in order.
+    """
+    # Key the cache by model so upgrading en_core_web_sm never serves stale entities
+    model_dir = os.path.join(SPACY_CACHE_DIR, f"{nlp.meta['lang']}_{nlp.meta['name']}-{nlp.meta['version']}")
+    path = os.path.join(model_dir, f"{username.lower()}.spacy")
+    cached = {}
+    if os.path.exists(path):
+        try:
+            cached = {_text_key(doc.text): doc for doc in DocBin().from_disk(path).get_docs(nlp.vocab)}
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable NER cache for {username}: {e}")
+    keys = [_text_key(text) for text in texts]
+    misses = {key: text for key, text in zip(keys, texts) if key not in cached}
+    new_docs = nlp.pipe(misses.values(), batch_size=64)
+    current = dict.fromkeys(keys)
+    changed = any(key not in current for key in cached)
+    try:
+        for key in keys:
+            if key not in cached:
+                cached[key] = next(new_docs)
+                changed = True
+            yield cached[key]
+    finally:
+        # Persist on early exit too, so docs parsed before the break are kept; only
+        # the user's current texts are written, so dropped texts leave the cache
+        if changed:
+            os.makedirs(model_dir, exist_ok=True)
+            DocBin(docs=[cached[key] for key in current if key in cached]).to_disk(path)
+
+def _text_key(text: str) -> str:
+    """
+    Hash a text for cache lookups.
+    
+    Args:
+        text: Text to hash.
+    Returns:
+        SHA-1 hex digest of the text.
+    """
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+def _finalize_persona(meta: Dict, summary: Optional[str]) -> Dict:
+    """
+    Assemble the persona from prepared inputs and a summary.
+    
+    Args:
+        meta: Intermediate fields from _prepare_persona_inputs.
+        summary: Summary of meta["combined_text"], or None to use the default.
+    Returns:
+        Enhanced persona dictionary.
+    """
+    if not summary:
+        summary = f"{meta['username'].capitalize()} is interested in AR/VR and AI technologies, engaging in related discussions."
+    is_tech = meta["is_tech"]
+    default_fields = meta["default_fields"]
+    
+    # Generate detailed about field
+    about = (f"{meta['name']} is a {meta['occupation'].lower()} who actively engages in {meta['community_count']} Reddit communities, "
+             f"with a strong focus on {meta['primary_interest']}. They {meta['engagement_style']}, often sharing their passion for "
+             f"{'AR/VR and AI technologies' if is_tech else 'diverse topics'}. "
+             f"{summary} Their posts and comments reveal a curious mind, eager to explore "
+             f"{'emerging tech trends' if is_tech else 'varied interests'} and connect "
+             f"with others in {'tech' if is_tech else 'online'} communities.")
+    
+    return {
+        "name": meta["name"],
+        "age": meta["age"],
+        "occupation": meta["occupation"],
+        "place": meta["place"],
+        "status": "Unknown",
+        "interests": meta["interests"],
         "about": about,
         "motivations": default_fields["motivations"],
         "goals": default_fields["goals"],
@@ -315,95 +708,97 @@ def generate_enhanced_persona(data: Dict, username: str) -> Dict:
         "frustrations": default_fields["frustrations"],
         "skills": default_fields["skills"],
         "personality": default_fields["personality"],
-        "sources": sources
+        "sources": meta["sources"]
     }
 
-def generate_html_persona(persona: Dict, username: str, raw_data: Dict) -> str:
-    """
-    Generate a professional HTML template for the user persona.
-    
-    Args:
-        persona: Enhanced persona dictionary.
-        username: Reddit username.
-        raw_data: Raw Reddit data for sources.
-    Returns:
-        HTML string.
-    """
-    sources = list(set([p["url"] for p in raw_data["posts"][:2]] + [c["url"] for c in raw_data["comments"][:2]]))
-    source_links = "".join([f'<li><a href="{s}" class="text-blue-600 hover:underline break-all" target="_blank">{s[:30]}...</a></li>' for s in sources])
-    html = f"""
+# Static persona page; placeholders are filled per user by generate_html_persona
+HTML_TEMPLATE = string.Template("""
     <!DOCTYPE html>
     <html lang="en">
     <head>
         <meta charset="UTF-8">
         <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>User Persona for u/{username}</title>
+        <title>User Persona for u/$username</title>
         <script src="https://cdn.tailwindcss.com"></script>
         <style>
-            .gradient-header {{
+            .gradient-header {
                 background: linear-gradient(to right, #36A2EB, #4BC0C0);
                 color: white;
                 padding: 1rem;
                 border-radius: 0.5rem;
                 margin-bottom: 1.5rem;
-            }}
+            }
         </style>
     </head>
     <body class="bg-gray-100 font-sans">
         <div class="container mx-auto p-6 max-w-4xl">
             <div class="bg-white rounded-lg shadow-lg p-8">
                 <div class="gradient-header text-center">
-                    <h1 class="text-3xl font-bold">User Persona: u/{username}</h1>
-                    <p class="text-lg">{persona['name']}</p>
+                    <h1 class="text-3xl font-bold">User Persona: u/$username</h1>
+                    <p class="text-lg">$name</p>
                 </div>
                 <div class="grid grid-cols-1 md:grid-cols-2 gap-6 mb-6">
                     <div class="bg-gray-50 p-4 rounded-lg shadow-sm">
                         <h2 class="text-xl font-semibold text-blue-700 mb-2">About</h2>
-                        <p class="text-gray-700 break-words">{persona['about']}</p>
+                        <p class="text-gray-700 break-words">$about</p>
                     </div>
                     <div class="bg-gray-50 p-4 rounded-lg shadow-sm">
                         <h2 class="text-xl font-semibold text-blue-700 mb-2">Details</h2>
-                        <p class="text-gray-700"><strong>Age:</strong> {persona['age']}</p>
-                        <p class="text-gray-700"><strong>Occupation:</strong> {persona['occupation']}</p>
-                        <p class="text-gray-700"><strong>Place:</strong> {persona['place']}</p>
-                        <p class="text-gray-700"><strong>Status:</strong> {persona['status']}</p>
+                        <p class="text-gray-700"><strong>Age:</strong> $age</p>
+                        <p class="text-gray-700"><strong>Occupation:</strong> $occupation</p>
+                        <p class="text-gray-700"><strong>Place:</strong> $place</p>
+                        <p class="text-gray-700"><strong>Status:</strong> $status</p>
                     </div>
                 </div>
                 <div class="bg-gray-50 p-4 rounded-lg shadow-sm mb-6">
                     <h2 class="text-xl font-semibold text-blue-700 mb-2">Interests</h2>
-                    <p class="text-gray-700 break-words">{persona['interests']}</p>
+                    <p class="text-gray-700 break-words">$interests</p>
                 </div>
                 <div class="grid grid-cols-1 md:grid-cols-2 gap-6 mb-6">
                     <div class="bg-gray-50 p-4 rounded-lg shadow-sm">
                         <h2 class="text-xl font-semibold text-blue-700 mb-2">Motivations & Goals</h2>
-                        <p class="text-gray-700 break-words"><strong>Motivations:</strong> {persona['motivations']}</p>
-                        <p class="text-gray-700 break-words"><strong>Goals:</strong> {persona['goals']}</p>
+                        <p class="text-gray-700 break-words"><strong>Motivations:</strong> $motivations</p>
+                        <p class="text-gray-700 break-words"><strong>Goals:</strong> $goals</p>
                     </div>
                     <div class="bg-gray-50 p-4 rounded-lg shadow-sm">
                         <h2 class="text-xl font-semibold text-blue-700 mb-2">Behaviors & Habits</h2>
-                        <p class="text-gray-700 break-words"><strong>Behaviors:</strong> {persona['behaviors']}</p>
-                        <p class="text-gray-700 break-words"><strong>Habits:</strong> {persona['habits']}</p>
+                        <p class="text-gray-700 break-words"><strong>Behaviors:</strong> $behaviors</p>
+                        <p class="text-gray-700 break-words"><strong>Habits:</strong> $habits</p>
                     </div>
                 </div>
                 <div class="bg-gray-50 p-4 rounded-lg shadow-sm mb-6">
                     <h2 class="text-xl font-semibold text-blue-700 mb-2">Skills & Personality</h2>
-                    <p class="text-gray-700 break-words"><strong>Skills:</strong> {persona['skills']}</p>
-                    <p class="text-gray-700 break-words"><strong>Personality:</strong> {persona['personality']}</p>
-                    <p class="text-gray-700 break-words"><strong>Frustrations:</strong> {persona['frustrations']}</p>
+                    <p class="text-gray-700 break-words"><strong>Skills:</strong> $skills</p>
+                    <p class="text-gray-700 break-words"><strong>Personality:</strong> $personality</p>
+                    <p class="text-gray-700 break-words"><strong>Frustrations:</strong> $frustrations</p>
                 </div>
                 <div class="bg-gray-50 p-4 rounded-lg shadow-sm mb-6">
                     <h2 class="text-xl font-semibold text-blue-700 mb-2">Sources</h2>
-                    <ul class="list-disc list-inside text-gray-700">{source_links}</ul>
+                    <ul class="list-disc list-inside text-gray-700">$source_links</ul>
                 </div>
             </div>
             <footer class="mt-6 text-center text-gray-600">
-                <p>Generated for BeyondChats Internship Assignment | {username}</p>
+                <p>Generated for BeyondChats Internship Assignment | $username</p>
             </footer>
         </div>
     </body>
     </html>
+    """)
+
+def generate_html_persona(persona: Dict, username: str, raw_data: Dict) -> str:
     """
-    return html
+    Generate a professional HTML template for the user persona.
+    
+    Args:
+        persona: Enhanced persona dictionary.
+        username: Reddit username.
+        raw_data: Raw Reddit data for sources.
+    Returns:
+        HTML string.
+    """
+    sources = list(set([p["url"] for p in raw_data["posts"][:2]] + [c["url"] for c in raw_data["comments"][:2]]))
+    source_links = "".join([f'<li><a href="{s}" class="text-blue-600 hover:underline break-all" target="_blank">{s[:30]}...</a></li>' for s in sources])
+    return HTML_TEMPLATE.substitute(persona, username=username, source_links=source_links)
 
 def save_text_persona(persona: Dict, username: str) -> None:
     """
@@ -443,22 +838,27 @@ def main():
     Main function to orchestrate persona generation.
     """
     usernames = get_usernames()
-    raw_data = {}
-    enhanced_personas = {}
+    raw_data = fetch_all_reddit_data(usernames)
+    metas = {}
     for username in usernames:
-        raw_data[username] = fetch_reddit_data(username)
         if raw_data[username]["exists"]:
-            persona = generate_enhanced_persona(raw_data[username], username)
-            enhanced_personas[username] = persona
-            logger.info(f"Enhanced persona for {username}: {persona}")
-            save_text_persona(persona, username)
-            html_content = generate_html_persona(persona, username, raw_data[username])
-            with open(f"{username}_persona.html", "w", encoding="utf-8") as f:
-                f.write(html_content)
-            logger.info(f"Saved HTML persona to {username}_persona.html")
+            logger.info(f"Generating persona for {username}")
+            metas[username] = _prepare_persona_inputs(raw_data[username], username)
         else:
             logger.warning(f"Skipping persona generation for {username} due to missing data.")
     
+    # Summarize all users in batched calls, then reassemble by index
+    summaries = summarize_texts([meta["combined_text"] or "" for meta in metas.values()])
+    enhanced_personas = {}
+    for (username, meta), summary in zip(metas.items(), summaries):
+        persona = _finalize_persona(meta, summary)
+        enhanced_personas[username] = persona
+        logger.info(f"Enhanced persona for {username}: {persona}")
+        save_text_persona(persona, username)
+        html_content = generate_html_persona(persona, username, raw_data[username])
+        Path(f"{username}_persona.html").write_text(html_content, encoding="utf-8")
+        logger.info(f"Saved HTML persona to {username}_persona.html")
+    
     access_html_files(usernames)
 
 if __name__ == "__main__":